@@ -5,10 +5,15 @@ VIX・株価変動率を自動取得、バフェット指数のみ手動入力
 """
 
 import streamlit as st
-import yfinance as yf
+import threading
+import time
+from collections import namedtuple
+from operator import itemgetter
 from datetime import datetime, timedelta
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-import requests
 
 # ページ設定
 st.set_page_config(
@@ -17,13 +22,67 @@ st.set_page_config(
     layout="wide"
 )
 
+# ===== HTTPセッション =====
+# 通信タイムアウト（接続, 読み取り）秒
+HTTP_TIMEOUT = (3, 7)
+
+@st.cache_resource
+def get_http_session():
+    """
+    接続プール・再試行付きのHTTPセッションを取得（アプリ全体で共有）
+
+    Streamlitは再実行のたびにスクリプト全体を評価し直すため、
+    cache_resourceで保持してkeep-alive接続を再利用する。
+    requestsは通知送信時にのみ必要なため、初回呼び出し時に読み込む。
+
+    Returns:
+    --------
+    requests.Session : 共有HTTPセッション
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    # 送信はすべてJSONのため、共通ヘッダーはセッションに持たせる
+    session.headers.update({"Content-Type": "application/json"})
+    # Webhookへの投稿は冪等ではないため、確実に未処理と分かる場合のみ再試行
+    # （接続失敗とレート制限。429はRetry-Afterに従って待機）
+    # ゲートウェイエラーや読み取りタイムアウトは受理済みの可能性があるため再送しない
+    retry = Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=[429],
+        allowed_methods=frozenset({"GET", "POST"}),
+        respect_retry_after_header=True
+    )
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, max_retries=retry)
+    session.mount("https://", adapter)
+    return session
+
 # ===== Discord Webhook送信関数 =====
-def send_discord_notification(message):
+@st.cache_resource
+def get_notify_executor() -> ThreadPoolExecutor:
     """
-    Discord Webhookでメッセージを送信
+    通知送信用のスレッドプールを取得（アプリ全体で共有）
+
+    Returns:
+    --------
+    ThreadPoolExecutor : 通知送信用スレッドプール
+    """
+    return ThreadPoolExecutor(max_workers=2)
+
+def post_discord_webhook(webhook_url, message):
+    """
+    Discord WebhookにメッセージをPOST（ワーカースレッドで実行）
+
+    Streamlitのコンテキスト外で実行されるため、st.*は呼び出さない。
 
     Parameters:
     -----------
+    webhook_url : str
+        Discord Webhook URL
     message : str
         送信するメッセージ
 
@@ -31,23 +90,200 @@ def send_discord_notification(message):
     --------
     bool : 送信成功ならTrue、失敗ならFalse
     """
+    data = {"content": message}
+
+    response = get_http_session().post(webhook_url, json=data, timeout=HTTP_TIMEOUT)
+
+    return response.status_code == 204
+
+def send_discord_notification(message):
+    """
+    Discord Webhookでメッセージを送信（バックグラウンド実行）
+
+    Parameters:
+    -----------
+    message : str
+        送信するメッセージ
+
+    Returns:
+    --------
+    Future | None : 送信処理のFuture（結果はbool）、Webhook未設定ならNone
+    """
+    # Streamlit SecretsからWebhook URLを取得
+    if "discord_webhook_url" not in st.secrets:
+        return None
+
+    webhook_url = st.secrets["discord_webhook_url"]
+
+    return get_notify_executor().submit(post_discord_webhook, webhook_url, message)
+
+# ===== 市場データ取得関数 =====
+@st.cache_resource
+def get_yfinance():
+    """
+    yfinanceモジュールを取得（初回呼び出し時に読み込み）
+
+    読み込みに時間がかかるため、起動直後の描画を遅らせないよう
+    市場データの取得時まで遅延させる。
+
+    Returns:
+    --------
+    module : yfinance
+    """
+    import yfinance
+    return yfinance
+
+# 取得対象: VIX指数・日経平均・S&P500
+MARKET_SYMBOLS = ("^VIX", "^N225", "^GSPC")
+
+# 3ヶ月変動率の計算に使う営業日数（最新値を含む）
+THREE_MONTH_BARS = 60
+
+# 市場データのディスクキャッシュ（アプリ再起動後も再利用）
+MARKET_CACHE_DIR = Path(__file__).parent / ".cache"
+# 市場データのキャッシュ時間枠
+# メモリ・ディスクのキャッシュとも同じ時間枠の区切りで失効させ、
+# 表示される市場データが1時間より古くならないようにする
+MARKET_CACHE_TTL = 3600  # 秒
+
+# 現在の時間枠（MARKET_CACHE_TTLごとに切り替わる）
+def market_cache_slot() -> int:
+    return int(time.time() // MARKET_CACHE_TTL)
+
+class IncompleteMarketData(Exception):
+    """一部の銘柄を取得できなかったことを示す例外（取得できた分の終値をclosesに保持）"""
+
+    def __init__(self, closes, missing):
+        super().__init__(f"市場データを一部取得できませんでした: {', '.join(missing)}")
+        self.closes = closes
+
+@st.cache_data(ttl=MARKET_CACHE_TTL, show_spinner=False)
+def fetch_history(symbols: tuple, period: str, slot: int) -> pd.DataFrame:
+    """
+    Yahoo Financeから複数銘柄の終値履歴を一括取得（時間枠ごとにキャッシュ）
+
+    判定に使うのは終値のみのため、配当・分割情報や時間外取引は取得せず、
+    Close列以外はキャッシュする前に捨てる。
+    取得結果はparquetファイルにも保存し、同じ時間枠内ならプロセスの
+    再起動後もYahoo Financeにアクセスせずに読み込む。
+    メモリ・ディスクとも時間枠が変わると再取得するため、
+    返すデータは最大でも1時間前に取得したものになる。
+
+    Parameters:
+    -----------
+    symbols : tuple
+        ティッカーシンボルのタプル（例: ("^VIX", "^N225")）
+    period : str
+        取得期間（例: "6mo"）
+    slot : int
+        時間枠（market_cache_slot()の値、切り替わるとキャッシュも切り替わる）
+
+    Returns:
+    --------
+    pd.DataFrame : 終値（列: ティッカーシンボル）
+
+    Raises:
+    -------
+    IncompleteMarketData
+        一部の銘柄の終値を取得できなかった場合（取得できた分を保持）
+    ValueError
+        全ての銘柄の終値を取得できなかった場合
+    """
+    cache_path = MARKET_CACHE_DIR / f"{'_'.join(symbols)}_{period}.parquet"
     try:
-        # Streamlit SecretsからWebhook URLを取得
-        if "discord_webhook_url" not in st.secrets:
-            return False
+        if int(cache_path.stat().st_mtime // MARKET_CACHE_TTL) == slot:
+            return pd.read_parquet(cache_path)
+    except Exception:
+        # キャッシュなし・破損時はYahoo Financeから取得
+        pass
+
+    history = get_yfinance().download(
+        list(symbols),
+        period=period,
+        auto_adjust=False,
+        actions=False,
+        prepost=False,
+        threads=True,
+        timeout=sum(HTTP_TIMEOUT),
+        progress=False
+    )
+    closes = history["Close"]
 
-        webhook_url = st.secrets["discord_webhook_url"]
+    # yfinanceは取得に失敗した銘柄も例外にせず空の列を返すため、ここで検証する
+    # （例外にすればメモリ・ディスクどちらのキャッシュにも残らず、次回の再実行で再取得される）
+    missing = [symbol for symbol in symbols if symbol not in closes or closes[symbol].dropna().empty]
+    if len(missing) == len(symbols):
+        raise ValueError(f"市場データを取得できませんでした: {', '.join(missing)}")
+    if missing:
+        # 取得できた銘柄の指標は表示できるよう、終値を例外に持たせて返す
+        raise IncompleteMarketData(closes.reindex(columns=list(symbols)), missing)
 
-        # Discord Webhook API
-        headers = {"Content-Type": "application/json"}
-        data = {"content": message}
+    try:
+        MARKET_CACHE_DIR.mkdir(exist_ok=True)
+        closes.to_parquet(cache_path)
+    except Exception:
+        # 書き込めない環境ではメモリキャッシュのみで動作
+        pass
 
-        response = requests.post(webhook_url, headers=headers, json=data)
+    return closes
 
-        return response.status_code == 204
-    except Exception as e:
-        st.error(f"Discord通知エラー: {str(e)}")
-        return False
+def evaluate_markets() -> dict:
+    """
+    市場データを取得し、暴落判定に使う指標を計算
+
+    取得はfetch_historyのキャッシュに任せ、ここでは数列の計算のみ行う
+    （キャッシュを重ねるとデータの鮮度が保証できなくなるため）。
+
+    Returns:
+    --------
+    dict : VIX値（vix）と3ヶ月変動率（nikkei_change, sp500_change）
+           データ不足の指標はNone
+    """
+    try:
+        closes = fetch_history(MARKET_SYMBOLS, "6mo", market_cache_slot())
+    except IncompleteMarketData as e:
+        # 一部の銘柄のみ取得失敗: キャッシュせずに、取得できた指標だけで判定する
+        closes = e.closes
+
+    vix_close = closes["^VIX"].dropna()
+    vix = float(vix_close.iloc[-1]) if not vix_close.empty else None
+
+    # 休場日は市場ごとに異なるため、銘柄ごとに欠損を除いてから変動率を計算
+    changes = closes[["^N225", "^GSPC"]].apply(
+        lambda close: close.dropna().pct_change(THREE_MONTH_BARS - 1, fill_method=None).iloc[-1] * 100
+        if close.count() >= THREE_MONTH_BARS else float("nan")
+    )
+
+    return {
+        "vix": vix,
+        "nikkei_change": None if pd.isna(changes["^N225"]) else float(changes["^N225"]),
+        "sp500_change": None if pd.isna(changes["^GSPC"]) else float(changes["^GSPC"])
+    }
+
+@st.cache_resource
+def start_market_warmup():
+    """
+    市場データの先読みをバックグラウンドで開始（プロセスごとに1回）
+
+    最初の利用者が画面上部を操作している間に取得を済ませ、
+    市場データ表示までの待ち時間を短くする。
+
+    Returns:
+    --------
+    threading.Thread : 先読みスレッド
+    """
+    def warmup():
+        try:
+            fetch_history(MARKET_SYMBOLS, "6mo", market_cache_slot())
+        except Exception:
+            # 失敗時は通常の表示処理で再取得・エラー表示する
+            pass
+
+    thread = threading.Thread(target=warmup, daemon=True)
+    thread.start()
+    return thread
+
+start_market_warmup()
 
 # タイトル
 st.title("📊 Plan C 暴落判定アプリ（日米別判定版）")
@@ -57,10 +293,8 @@ st.markdown("**毎月14日に実施** - 翌15日の投資額と配分を決定")
 today = datetime.now().strftime("%Y年%m月%d日")
 st.info(f"判定日: {today}")
 
-st.markdown("---")
-
 # ===== ベース金額設定 =====
-st.subheader("💰 月次投資額の設定")
+st.markdown("---\n\n### 💰 月次投資額の設定")
 
 base_amount = st.number_input(
     "通常時の月次投資額（円）",
@@ -86,6 +320,20 @@ FUND_RATIOS = {
     "os_bond": 0.05        # 先進国債券 5%
 }
 
+# ファンドの並び順と配分比率（ベクトル計算用）
+FUND_KEYS = tuple(FUND_RATIOS)
+FUND_RATIO_ARRAY = np.array([FUND_RATIOS[key] for key in FUND_KEYS], dtype=np.float64)
+JP_FUND_MASK = np.array([key.startswith("jp_") for key in FUND_KEYS])
+FUND_LABELS = {
+    "jp_stock": "国内株式",
+    "jp_reit": "国内REIT",
+    "jp_bond": "国内債券",
+    "global_stock": "全世界株式",
+    "us_stock": "米国株式",
+    "os_reit": "先進国REIT",
+    "os_bond": "先進国債券"
+}
+
 # つみたて投資枠の上限
 TSUMITATE_LIMIT = 100000
 
@@ -93,14 +341,163 @@ TSUMITATE_LIMIT = 100000
 def round_to_1000(value):
     return int(round(value / 1000) * 1000)
 
+def round_to_1000_array(values):
+    return np.rint(values / 1000).astype(np.int64) * 1000
+
+# リバランスの目標額と調整額（各ファンド、FUND_KEYS順）
+def compute_rebalance_targets(current, total):
+    targets = round_to_1000_array(total * FUND_RATIO_ARRAY)
+    return targets, targets - current
+
+def l2_rebalance(x, targets, y):
+    """
+    売却せずに追加投資額yを配分し、目標比率との二乗誤差を最小にする（水位計算）
+
+    各ファンドの不足 d_i = targets_i × (Σx + y) − x_i に対して、
+    追加額は max(0, d_i − λ) となる。λ は合計がyになる水位で、
+    不足の大きい順に1回走査するだけで求まる。
+
+    Parameters:
+    -----------
+    x : np.ndarray
+        各ファンドの現在額
+    targets : np.ndarray
+        各ファンドの目標比率（合計1）
+    y : float
+        追加投資額
+
+    Returns:
+    --------
+    np.ndarray : 各ファンドへの追加額（丸め前）
+    """
+    deviations = targets * (x.sum() + y) - x
+    if y <= 0:
+        return np.zeros_like(deviations)
+
+    ordered = np.sort(deviations)[::-1]
+    levels = (np.cumsum(ordered) - y) / np.arange(1, len(ordered) + 1)
+    water_level = levels[np.nonzero(ordered > levels)[0][-1]]
+    return np.maximum(deviations - water_level, 0)
+
+# 次回投資額の配分（各ファンド、FUND_KEYS順）
+def allocate_next_amounts(base_amount, additional_amount, current, shortages, normal_alloc, min_purchase, use_additional):
+    if use_additional:
+        # 追加資金は次回1回だけのため、買付後の残高が目標比率に最も近づくよう配分（水位計算）
+        allocatable = additional_amount
+        base_array = normal_alloc
+        total_investment = base_amount + additional_amount
+        holdings = current + base_array
+        additions = l2_rebalance(holdings, FUND_RATIO_ARRAY, allocatable)
+        priority = FUND_RATIO_ARRAY * (holdings.sum() + allocatable) - holdings
+    else:
+        # 同じ金額を数ヶ月継続するため、全ての不足ファンドに不足額の比率で配分
+        # （ベース金額から最低購入金額×7を引いた額を配分）
+        allocatable = base_amount - min_purchase * len(current)
+        base_array = np.full(len(current), min_purchase, dtype=np.int64)
+        total_investment = base_amount
+        additions = allocatable * (shortages / shortages.sum())
+        priority = shortages
+
+    next_array = base_array + round_to_1000_array(additions)
+
+    # 端数調整（合計がtotal_investmentになるよう、最も不足しているファンドに追加）
+    # 通常配分は各ファンドで丸めているため、合計が月次投資額とずれる分もここで吸収する
+    next_array[priority.argmax()] += total_investment - int(next_array.sum())
+    return next_array
+
+@st.cache_data(show_spinner=False)
+def compute_rebalance(mode: str, base_amount: int, min_purchase: int, additional_amount: int,
+                      current: tuple, shortages: tuple, normal_alloc: tuple) -> dict:
+    """
+    リバランスを考慮した次回投資額と必要継続月数を計算
+
+    入力が変わらない限り、関係のないウィジェット操作では再計算しない。
+
+    Parameters:
+    -----------
+    mode : str
+        リバランス戦略（"月次投資額の範囲内で調整" または "追加資金でリバランス"）
+    base_amount : int
+        月次投資額
+    min_purchase : int
+        各ファンドの最低購入金額（月次投資額の範囲内で調整する場合のみ使用）
+    additional_amount : int
+        追加投資額（追加資金でリバランスする場合のみ使用）
+    current : tuple
+        各ファンドの現在残高（FUND_KEYS順）
+    shortages : tuple
+        各ファンドの不足額（FUND_KEYS順、不足していなければ0）
+    normal_alloc : tuple
+        各ファンドの通常配分額（FUND_KEYS順）
+
+    Returns:
+    --------
+    dict
+        next（ファンド別の次回投資額）, fund_details, improved_count（増額される不足ファンド数）,
+        unfunded（増額されない不足ファンド名）, max_months, total_investment
+    """
+    shortage_array = np.array(shortages, dtype=np.int64)
+    normal_array = np.array(normal_alloc, dtype=np.int64)
+
+    next_array = allocate_next_amounts(
+        base_amount, additional_amount, np.array(current, dtype=np.int64), shortage_array, normal_array, min_purchase,
+        use_additional=(mode == "追加資金でリバランス")
+    )
+    total_investment = int(next_array.sum())
+
+    # 各不足ファンドの必要月数を計算（不足額 ÷ 通常配分からの増額、切り上げ）
+    additional_array = next_array - normal_array
+    mask = (shortage_array > 0) & (additional_array > 0)
+    months = np.where(mask, -(-shortage_array // np.maximum(additional_array, 1)), 0)
+
+    # 不足していても増額されないファンド（不足の大きいファンドを優先して配分したため）
+    unfunded_mask = (shortage_array > 0) & ~mask
+    unfunded = [FUND_LABELS[key] for key, flag in zip(FUND_KEYS, unfunded_mask.tolist()) if flag]
+    fund_details = [
+        f"{FUND_LABELS[key]}: {m}ヶ月" if m > 0 else f"{FUND_LABELS[key]}: 今回は増額なし（再計算で配分）"
+        for key, m, flag in zip(FUND_KEYS, months.tolist(), (mask | unfunded_mask).tolist()) if flag
+    ]
+
+    return {
+        "next": dict(zip(FUND_KEYS, next_array.tolist())),
+        "fund_details": fund_details,
+        "improved_count": int(mask.sum()),
+        "unfunded": unfunded,
+        "max_months": int(months.max()),
+        "total_investment": total_investment
+    }
+
+@st.cache_data(show_spinner=False)
+def build_next_df(labels: tuple, normal: tuple, adjusted: tuple) -> pd.DataFrame:
+    """
+    次回投資額の比較表を作成（入力が同じなら作り直さない）
+
+    Parameters:
+    -----------
+    labels : tuple
+        ファンド名
+    normal : tuple
+        通常配分額
+    adjusted : tuple
+        調整後の次回投資額
+
+    Returns:
+    --------
+    pd.DataFrame : ファンド・通常配分・調整後・差分の表（金額は数値のまま）
+    """
+    normal_array = np.array(normal, dtype=np.int64)
+    adjusted_array = np.array(adjusted, dtype=np.int64)
+    return pd.DataFrame({
+        "ファンド": list(labels),
+        "通常配分": normal_array,
+        "調整後": adjusted_array,
+        "差分": adjusted_array - normal_array
+    })
+
 # 各ファンドの金額を計算
-jp_stock = round_to_1000(base_amount * FUND_RATIOS["jp_stock"])
-jp_reit = round_to_1000(base_amount * FUND_RATIOS["jp_reit"])
-jp_bond = round_to_1000(base_amount * FUND_RATIOS["jp_bond"])
-global_stock_total = round_to_1000(base_amount * FUND_RATIOS["global_stock"])
-us_stock = round_to_1000(base_amount * FUND_RATIOS["us_stock"])
-os_reit = round_to_1000(base_amount * FUND_RATIOS["os_reit"])
-os_bond = round_to_1000(base_amount * FUND_RATIOS["os_bond"])
+base_allocation = round_to_1000_array(base_amount * FUND_RATIO_ARRAY)
+(jp_stock, jp_reit, jp_bond, global_stock_total,
+ us_stock, os_reit, os_bond) = base_allocation.tolist()
 
 # グローバル株式をつみたて投資枠と成長投資枠に分割
 if global_stock_total <= TSUMITATE_LIMIT:
@@ -118,57 +515,71 @@ os_total = global_stock_total + us_stock + os_reit + os_bond
 crash_fund_jp = round_to_1000(base_amount * JP_RATIO)
 crash_fund_os = round_to_1000(base_amount * OS_RATIO)
 
+# 暴落時の各ファンド追加投資額（資産クラス内の比率を維持）
+crash_adds = round_to_1000_array(
+    np.where(JP_FUND_MASK, crash_fund_jp, crash_fund_os) * FUND_RATIO_ARRAY
+    / np.where(JP_FUND_MASK, JP_RATIO, OS_RATIO)
+)
+
+# 表示用の金額文字列（まとめて整形）
+YenLabels = namedtuple("YenLabels", [
+    "base", "jp_total", "os_total", "crash_jp", "crash_os",
+    "jp_total_with_crash", "os_total_with_crash",
+    "total_with_crash_jp", "total_with_crash_os", "total_with_crash_both"
+])
+yen = YenLabels(*pd.Series([
+    base_amount, jp_total, os_total, crash_fund_jp, crash_fund_os,
+    jp_total + crash_fund_jp, os_total + crash_fund_os,
+    base_amount + crash_fund_jp, base_amount + crash_fund_os, base_amount * 2
+], dtype=np.int64).map("{:,}円".format))
+
 # 配分表示
 col1, col2, col3 = st.columns(3)
 with col1:
-    st.metric("日本資産（30%）", f"{jp_total:,}円")
+    st.metric("日本資産（30%）", yen.jp_total)
 with col2:
-    st.metric("海外資産（70%）", f"{os_total:,}円")
+    st.metric("海外資産（70%）", yen.os_total)
 with col3:
-    st.metric("合計", f"{base_amount:,}円")
+    st.metric("合計", yen.base)
 
 st.markdown(f"""
 **暴落時の追加投資用資金配分:**
-- 日本市場暴落時: +{crash_fund_jp:,}円（日本資産のみ）
-- 米国市場暴落時: +{crash_fund_os:,}円（海外資産のみ）
-- 両市場暴落時: +{base_amount:,}円（全資産）
+- 日本市場暴落時: +{yen.crash_jp}（日本資産のみ）
+- 米国市場暴落時: +{yen.crash_os}（海外資産のみ）
+- 両市場暴落時: +{yen.base}（全資産）
 """)
 
-st.markdown("---")
+# ===== 市場データ取得（1時間ごとに更新）=====
+try:
+    with st.spinner("市場データを取得中..."):
+        market = evaluate_markets()
+except Exception as e:
+    st.error(f"❌ 市場データ取得エラー: {e}")
+    market = {"vix": None, "nikkei_change": None, "sp500_change": None}
 
-# ===== VIX指数取得（共通）=====
-st.subheader("📈 VIX指数（共通指標）")
+# ===== VIX指数（共通）=====
+st.markdown("---\n\n### 📈 VIX指数（共通指標）")
 
-with st.spinner("VIX指数を取得中..."):
-    try:
-        vix_ticker = yf.Ticker("^VIX")
-        vix_data = vix_ticker.history(period="5d")
-
-        if not vix_data.empty:
-            vix_value = vix_data['Close'].iloc[-1]
-            vix_condition = vix_value > 30
-
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric(
-                    label="現在のVIX",
-                    value=f"{vix_value:.2f}",
-                    delta=f"基準: 30以上"
-                )
-            with col2:
-                if vix_condition:
-                    st.success("✅ VIX > 30（恐怖指数上昇）")
-                else:
-                    st.info("❌ VIX ≤ 30（通常範囲）")
-        else:
-            st.error("❌ VIXデータの取得に失敗しました")
-            vix_value = None
-            vix_condition = False
+vix_value = market["vix"]
 
-    except Exception as e:
-        st.error(f"❌ VIX取得エラー: {e}")
-        vix_value = None
-        vix_condition = False
+if vix_value is not None:
+    vix_condition = vix_value > 30
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric(
+            label="現在のVIX",
+            value=f"{vix_value:.2f}",
+            delta=f"基準: 30以上"
+        )
+    with col2:
+        if vix_condition:
+            st.success("✅ VIX > 30（恐怖指数上昇）")
+        else:
+            st.info("❌ VIX ≤ 30（通常範囲）")
+else:
+    st.error("❌ VIXデータの取得に失敗しました")
+    vix_condition = False
 
 st.markdown("---")
 
@@ -177,11 +588,12 @@ col_jp, col_us = st.columns(2)
 
 # ===== 日本市場判定 =====
 with col_jp:
-    st.subheader("🇯🇵 日本市場")
-
     # バフェット指数（日本）
-    st.markdown("**バフェット指数（日本）**")
-    st.markdown("[日本バフェット指数](https://nikkeiyosoku.com/buffett/)で確認")
+    st.markdown(
+        "### 🇯🇵 日本市場\n\n"
+        "**バフェット指数（日本）**\n\n"
+        "[日本バフェット指数](https://nikkeiyosoku.com/buffett/)で確認"
+    )
 
     buffett_jp = st.number_input(
         "日本バフェット指数（%）",
@@ -199,41 +611,26 @@ with col_jp:
     else:
         st.info(f"❌ {buffett_jp:.1f}% ≥ 80%（通常）")
 
-    st.markdown("---")
-
     # 日経平均（3ヶ月変動率）
-    st.markdown("**日経平均（3ヶ月変動率）**")
+    st.markdown("---\n\n**日経平均（3ヶ月変動率）**")
 
-    with st.spinner("日経平均を取得中..."):
-        try:
-            nikkei = yf.Ticker("^N225")
-            nikkei_hist = nikkei.history(period="6mo")
-
-            if len(nikkei_hist) >= 60:
-                nikkei_current = nikkei_hist['Close'].iloc[-1]
-                nikkei_3m_ago = nikkei_hist['Close'].iloc[-60]
-                nikkei_change = ((nikkei_current - nikkei_3m_ago) / nikkei_3m_ago) * 100
-
-                st.metric(
-                    label="日経平均（3ヶ月変動）",
-                    value=f"{nikkei_change:+.2f}%",
-                    delta="基準: -20%以下"
-                )
+    nikkei_change = market["nikkei_change"]
 
-                nikkei_condition = nikkei_change <= -20
-                if nikkei_condition:
-                    st.success(f"✅ {nikkei_change:.2f}% ≤ -20%（大幅下落）")
-                else:
-                    st.info(f"❌ {nikkei_change:.2f}% > -20%（通常）")
-            else:
-                st.warning("⚠️ 日経平均データ不足")
-                nikkei_change = None
-                nikkei_condition = False
+    if nikkei_change is not None:
+        st.metric(
+            label="日経平均（3ヶ月変動）",
+            value=f"{nikkei_change:+.2f}%",
+            delta="基準: -20%以下"
+        )
 
-        except Exception as e:
-            st.error(f"❌ 日経平均取得エラー: {e}")
-            nikkei_change = None
-            nikkei_condition = False
+        nikkei_condition = nikkei_change <= -20
+        if nikkei_condition:
+            st.success(f"✅ {nikkei_change:.2f}% ≤ -20%（大幅下落）")
+        else:
+            st.info(f"❌ {nikkei_change:.2f}% > -20%（通常）")
+    else:
+        st.warning("⚠️ 日経平均データ不足")
+        nikkei_condition = False
 
     st.markdown("---")
 
@@ -247,11 +644,12 @@ with col_jp:
 
 # ===== 米国市場判定 =====
 with col_us:
-    st.subheader("🇺🇸 米国（世界）市場")
-
     # バフェット指数（米国）
-    st.markdown("**バフェット指数（米国）**")
-    st.markdown("[米国バフェット指数](https://nikkeiyosoku.com/buffett_us/)で確認")
+    st.markdown(
+        "### 🇺🇸 米国（世界）市場\n\n"
+        "**バフェット指数（米国）**\n\n"
+        "[米国バフェット指数](https://nikkeiyosoku.com/buffett_us/)で確認"
+    )
 
     buffett_us = st.number_input(
         "米国バフェット指数（%）",
@@ -269,41 +667,26 @@ with col_us:
     else:
         st.info(f"❌ {buffett_us:.1f}% ≥ 80%（通常）")
 
-    st.markdown("---")
-
     # S&P500（3ヶ月変動率）
-    st.markdown("**S&P500（3ヶ月変動率）**")
+    st.markdown("---\n\n**S&P500（3ヶ月変動率）**")
 
-    with st.spinner("S&P500を取得中..."):
-        try:
-            sp500 = yf.Ticker("^GSPC")
-            sp500_hist = sp500.history(period="6mo")
-
-            if len(sp500_hist) >= 60:
-                sp500_current = sp500_hist['Close'].iloc[-1]
-                sp500_3m_ago = sp500_hist['Close'].iloc[-60]
-                sp500_change = ((sp500_current - sp500_3m_ago) / sp500_3m_ago) * 100
-
-                st.metric(
-                    label="S&P500（3ヶ月変動）",
-                    value=f"{sp500_change:+.2f}%",
-                    delta="基準: -20%以下"
-                )
+    sp500_change = market["sp500_change"]
 
-                sp500_condition = sp500_change <= -20
-                if sp500_condition:
-                    st.success(f"✅ {sp500_change:.2f}% ≤ -20%（大幅下落）")
-                else:
-                    st.info(f"❌ {sp500_change:.2f}% > -20%（通常）")
-            else:
-                st.warning("⚠️ S&P500データ不足")
-                sp500_change = None
-                sp500_condition = False
+    if sp500_change is not None:
+        st.metric(
+            label="S&P500（3ヶ月変動）",
+            value=f"{sp500_change:+.2f}%",
+            delta="基準: -20%以下"
+        )
 
-        except Exception as e:
-            st.error(f"❌ S&P500取得エラー: {e}")
-            sp500_change = None
-            sp500_condition = False
+        sp500_condition = sp500_change <= -20
+        if sp500_condition:
+            st.success(f"✅ {sp500_change:.2f}% ≤ -20%（大幅下落）")
+        else:
+            st.info(f"❌ {sp500_change:.2f}% > -20%（通常）")
+    else:
+        st.warning("⚠️ S&P500データ不足")
+        sp500_condition = False
 
     st.markdown("---")
 
@@ -315,461 +698,321 @@ with col_us:
     else:
         st.success("✅ **米国市場：通常**")
 
-st.markdown("---")
+# ===== 銘柄別買付金額表（4パターン共通）=====
+# 暴落した市場の資産にのみ追加投資
+add_array = crash_adds * np.where(JP_FUND_MASK, jp_crash, us_crash)
+global_index = FUND_KEYS.index("global_stock")
+global_add = int(add_array[global_index])
+
+# グローバル株式の追加投資をつみたて/成長枠に分割
+if global_stock_growth > 0:
+    # 既に分割されている場合、比率を維持して分割
+    global_tsumitate_ratio = global_stock_tsumitate / global_stock_total
+    global_stock_add_tsumitate = round_to_1000(global_add * global_tsumitate_ratio)
+    global_stock_add_growth = global_add - global_stock_add_tsumitate
+elif global_stock_total + global_add <= TSUMITATE_LIMIT:
+    global_stock_add_tsumitate = global_add
+    global_stock_add_growth = 0
+else:
+    # 追加投資でつみたて枠を超える場合
+    available_tsumitate = TSUMITATE_LIMIT - global_stock_tsumitate
+    global_stock_add_tsumitate = min(global_add, available_tsumitate)
+    global_stock_add_growth = global_add - global_stock_add_tsumitate
+
+if global_stock_growth > 0 or global_stock_add_growth > 0:
+    global_names = [
+        "eMAXIS Slim 全世界株式【つみたて投資枠】",
+        "eMAXIS Slim 全世界株式【成長投資枠】"
+    ]
+    global_regular = [global_stock_tsumitate, global_stock_growth]
+    global_additional = [global_stock_add_tsumitate, global_stock_add_growth]
+else:
+    global_names = ["eMAXIS Slim 全世界株式（除く日本）"]
+    global_regular = [global_stock_total]
+    global_additional = [global_add]
+
+fund_names = [
+    "eMAXIS Slim 国内株式（TOPIX）",
+    "eMAXIS Slim 国内リートインデックス",
+    "eMAXIS Slim 国内債券インデックス",
+    *global_names,
+    "eMAXIS Slim 米国株式（S&P500）",
+    "eMAXIS Slim 先進国リートインデックス",
+    "eMAXIS Slim 先進国債券インデックス"
+]
+fund_regular = np.array([jp_stock, jp_reit, jp_bond, *global_regular, us_stock, os_reit, os_bond], dtype=np.int64)
+fund_additional = np.concatenate(
+    [add_array[:global_index], global_additional, add_array[global_index + 1:]]
+).astype(np.int64)
+
+funds_df = pd.DataFrame({"ファンド名": fund_names})
+funds_df["通常（15日自動）"] = pd.Series(fund_regular).map("{:,}円".format)
+funds_df["追加（14日手動）"] = np.where(
+    fund_additional > 0,
+    "✅ +" + pd.Series(fund_additional).map("{:,}円".format),
+    "－"
+)
+funds_df["合計"] = pd.Series(fund_regular + fund_additional).map("{:,}円".format)
 
 # ===== 最終判定結果（4パターン） =====
-st.subheader("🎯 最終判定結果と投資指示")
-
-# 4パターン判定
-if not jp_crash and not us_crash:
-    # パターン1: 両方通常
-    pattern = "pattern1"
-    st.success("✅ **両市場とも通常（作業なし）**")
-
-    st.markdown(f"""
-    ### 💰 15日の自動買付（通常{base_amount:,}円のみ）
-    追加作業なし - 以下の金額が自動で買付されます。
-    """)
-
-    # 銘柄別買付金額表
-    fund_names = [
-        "eMAXIS Slim 国内株式（TOPIX）",
-        "eMAXIS Slim 国内リートインデックス",
-        "eMAXIS Slim 国内債券インデックス",
-    ]
-    fund_regular = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-    fund_additional = ["－", "－", "－"]
-    fund_total = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-
-    # グローバル株式の処理
-    if global_stock_growth > 0:
-        fund_names.extend([
-            "eMAXIS Slim 全世界株式【つみたて投資枠】",
-            "eMAXIS Slim 全世界株式【成長投資枠】"
-        ])
-        fund_regular.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-        fund_additional.extend(["－", "－"])
-        fund_total.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-    else:
-        fund_names.append("eMAXIS Slim 全世界株式（除く日本）")
-        fund_regular.append(f"{global_stock_total:,}円")
-        fund_additional.append("－")
-        fund_total.append(f"{global_stock_total:,}円")
-
-    # 残りのファンド
-    fund_names.extend([
-        "eMAXIS Slim 米国株式（S&P500）",
-        "eMAXIS Slim 先進国リートインデックス",
-        "eMAXIS Slim 先進国債券インデックス"
-    ])
-    fund_regular.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-    fund_additional.extend(["－", "－", "－"])
-    fund_total.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-
-    funds_df = pd.DataFrame({
-        "ファンド名": fund_names,
-        "通常（15日自動）": fund_regular,
-        "追加（14日手動）": fund_additional,
-        "合計": fund_total
-    })
+def render_plan(headline, work_minutes, manual_total, grand_total, point):
+    """
+    判定パターンに応じた投資指示を表示
 
-    st.dataframe(funds_df, use_container_width=True, hide_index=True)
+    Parameters:
+    -----------
+    headline : str
+        判定結果の見出し
+    work_minutes : int
+        14日の手動作業の所要時間（分）、0なら追加作業なし
+    manual_total : str
+        14日の手動買付の合計金額
+    grand_total : str
+        自動・手動を合わせた投資総額
+    point : str
+        追加投資のポイント
+    """
+    if work_minutes == 0:
+        st.success(headline)
+        st.markdown(f"""
+        ### 💰 15日の自動買付（通常{yen.base}のみ）
+        追加作業なし - 以下の金額が自動で買付されます。
+        """)
+        st.table(funds_df.set_index("ファンド名"))
+        st.markdown(f"""
+        ### 📊 資産クラス別合計
+        - 日本資産: {yen.jp_total}（30%）
+        - 海外資産: {yen.os_total}（70%）
+        - **合計**: {yen.base}
+        """)
+        return
 
+    st.error(headline)
     st.markdown(f"""
-    ### 📊 資産クラス別合計
-    - 日本資産: {jp_total:,}円（30%）
-    - 海外資産: {os_total:,}円（70%）
-    - **合計**: {base_amount:,}円
-    """)
-
-elif jp_crash and not us_crash:
-    # パターン2: 日本のみ暴落
-    pattern = "pattern2"
-    st.error("🚨 **日本市場のみ暴落！日本資産に追加投資**")
-
-    st.markdown("""
-    ### 📝 14日の作業（所要時間: 5分）
+    ### 📝 14日の作業（所要時間: {work_minutes}分）
     SBI証券にログインして、以下の金額で買付を実行してください。
     """)
+    st.table(funds_df.set_index("ファンド名"))
 
-    # 日本資産の追加投資金額を計算
-    jp_stock_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_stock"] / JP_RATIO)
-    jp_reit_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_reit"] / JP_RATIO)
-    jp_bond_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_bond"] / JP_RATIO)
-
-    # 銘柄別買付金額表
-    fund_names = [
-        "eMAXIS Slim 国内株式（TOPIX）",
-        "eMAXIS Slim 国内リートインデックス",
-        "eMAXIS Slim 国内債券インデックス",
-    ]
-    fund_regular = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-    fund_additional = [f"✅ +{jp_stock_add:,}円", f"✅ +{jp_reit_add:,}円", f"✅ +{jp_bond_add:,}円"]
-    fund_total = [f"{jp_stock + jp_stock_add:,}円", f"{jp_reit + jp_reit_add:,}円", f"{jp_bond + jp_bond_add:,}円"]
-
-    # グローバル株式の処理
-    if global_stock_growth > 0:
-        fund_names.extend([
-            "eMAXIS Slim 全世界株式【つみたて投資枠】",
-            "eMAXIS Slim 全世界株式【成長投資枠】"
-        ])
-        fund_regular.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-        fund_additional.extend(["－", "－"])
-        fund_total.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-    else:
-        fund_names.append("eMAXIS Slim 全世界株式（除く日本）")
-        fund_regular.append(f"{global_stock_total:,}円")
-        fund_additional.append("－")
-        fund_total.append(f"{global_stock_total:,}円")
-
-    # 残りのファンド
-    fund_names.extend([
-        "eMAXIS Slim 米国株式（S&P500）",
-        "eMAXIS Slim 先進国リートインデックス",
-        "eMAXIS Slim 先進国債券インデックス"
-    ])
-    fund_regular.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-    fund_additional.extend(["－", "－", "－"])
-    fund_total.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-
-    funds_df = pd.DataFrame({
-        "ファンド名": fund_names,
-        "通常（15日自動）": fund_regular,
-        "追加（14日手動）": fund_additional,
-        "合計": fund_total
-    })
-
-    st.dataframe(funds_df, use_container_width=True, hide_index=True)
-
-    jp_total_with_crash = jp_total + crash_fund_jp
-    total_with_crash = base_amount + crash_fund_jp
+    # 暴落した市場の資産クラスのみ手動買付を表示
+    jp_row = (f"**+{yen.crash_jp}** | **{yen.jp_total_with_crash}**" if jp_crash
+              else f"－ | {yen.jp_total}")
+    os_row = (f"**+{yen.crash_os}** | **{yen.os_total_with_crash}**" if us_crash
+              else f"－ | {yen.os_total}")
 
     st.markdown(f"""
     ### 💰 資産クラス別合計
 
     | 資産クラス | 自動（15日） | 手動（14日） | 合計 |
     |-----------|------------|------------|------|
-    | 日本資産 | {jp_total:,}円 | **+{crash_fund_jp:,}円** | **{jp_total_with_crash:,}円** |
-    | 海外資産 | {os_total:,}円 | － | {os_total:,}円 |
-    | **合計** | {base_amount:,}円 | {crash_fund_jp:,}円 | **{total_with_crash:,}円** |
+    | 日本資産 | {yen.jp_total} | {jp_row} |
+    | 海外資産 | {yen.os_total} | {os_row} |
+    | **合計** | {yen.base} | {manual_total} | **{grand_total}** |
 
-    **ポイント**: 日本市場が割安なので、暴落用資金（日本分{crash_fund_jp:,}円）を追加投資！30:70の比率を維持。
+    **ポイント**: {point}
     """)
 
-elif not jp_crash and us_crash:
-    # パターン3: 米国のみ暴落
-    pattern = "pattern3"
-    st.error("🚨 **米国（世界）市場のみ暴落！海外資産に追加投資**")
+# 判定パターン: (日本暴落, 米国暴落) -> 見出し, 作業時間, 手動合計, 総額, ポイント
+plans = {
+    (False, False): ("✅ **両市場とも通常（作業なし）**", 0, None, None, None),
+    (True, False): (
+        "🚨 **日本市場のみ暴落！日本資産に追加投資**", 5,
+        yen.crash_jp, yen.total_with_crash_jp,
+        f"日本市場が割安なので、暴落用資金（日本分{yen.crash_jp}）を追加投資！30:70の比率を維持。"
+    ),
+    (False, True): (
+        "🚨 **米国（世界）市場のみ暴落！海外資産に追加投資**", 7,
+        yen.crash_os, yen.total_with_crash_os,
+        f"米国・世界市場が割安なので、暴落用資金（海外分{yen.crash_os}）を追加投資！30:70の比率を維持。"
+    ),
+    (True, True): (
+        "🚨🚨 **日米両市場とも暴落！全資産に追加投資**", 10,
+        yen.base, yen.total_with_crash_both,
+        "日米両市場が割安！全資産に通常配分で追加投資！"
+    )
+}
 
-    st.markdown("""
-    ### 📝 14日の作業（所要時間: 7分）
-    SBI証券にログインして、以下の金額で買付を実行してください。
-    """)
+st.markdown("---\n\n### 🎯 最終判定結果と投資指示")
+render_plan(*plans[(jp_crash, us_crash)])
 
-    # 海外資産の追加投資金額を計算
-    global_stock_add = round_to_1000(crash_fund_os * FUND_RATIOS["global_stock"] / OS_RATIO)
-    us_stock_add = round_to_1000(crash_fund_os * FUND_RATIOS["us_stock"] / OS_RATIO)
-    os_reit_add = round_to_1000(crash_fund_os * FUND_RATIOS["os_reit"] / OS_RATIO)
-    os_bond_add = round_to_1000(crash_fund_os * FUND_RATIOS["os_bond"] / OS_RATIO)
-
-    # グローバル株式の追加投資をつみたて/成長枠に分割
-    if global_stock_growth > 0:
-        # 既に分割されている場合、比率を維持して分割
-        global_tsumitate_ratio = global_stock_tsumitate / global_stock_total
-        global_stock_add_tsumitate = round_to_1000(global_stock_add * global_tsumitate_ratio)
-        global_stock_add_growth = global_stock_add - global_stock_add_tsumitate
-    else:
-        # 追加投資でつみたて枠を超える場合
-        if global_stock_total + global_stock_add <= TSUMITATE_LIMIT:
-            global_stock_add_tsumitate = global_stock_add
-            global_stock_add_growth = 0
-        else:
-            available_tsumitate = TSUMITATE_LIMIT - global_stock_tsumitate
-            global_stock_add_tsumitate = min(global_stock_add, available_tsumitate)
-            global_stock_add_growth = global_stock_add - global_stock_add_tsumitate
-
-    # 銘柄別買付金額表
-    fund_names = [
-        "eMAXIS Slim 国内株式（TOPIX）",
-        "eMAXIS Slim 国内リートインデックス",
-        "eMAXIS Slim 国内債券インデックス",
-    ]
-    fund_regular = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-    fund_additional = ["－", "－", "－"]
-    fund_total = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-
-    # グローバル株式の処理
-    if global_stock_growth > 0 or global_stock_add_growth > 0:
-        fund_names.extend([
-            "eMAXIS Slim 全世界株式【つみたて投資枠】",
-            "eMAXIS Slim 全世界株式【成長投資枠】"
-        ])
-        fund_regular.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-        fund_additional.extend([f"✅ +{global_stock_add_tsumitate:,}円" if global_stock_add_tsumitate > 0 else "－",
-                               f"✅ +{global_stock_add_growth:,}円" if global_stock_add_growth > 0 else "－"])
-        fund_total.extend([f"{global_stock_tsumitate + global_stock_add_tsumitate:,}円",
-                          f"{global_stock_growth + global_stock_add_growth:,}円"])
-    else:
-        fund_names.append("eMAXIS Slim 全世界株式（除く日本）")
-        fund_regular.append(f"{global_stock_total:,}円")
-        fund_additional.append(f"✅ +{global_stock_add:,}円")
-        fund_total.append(f"{global_stock_total + global_stock_add:,}円")
-
-    # 残りのファンド
-    fund_names.extend([
-        "eMAXIS Slim 米国株式（S&P500）",
-        "eMAXIS Slim 先進国リートインデックス",
-        "eMAXIS Slim 先進国債券インデックス"
-    ])
-    fund_regular.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-    fund_additional.extend([f"✅ +{us_stock_add:,}円", f"✅ +{os_reit_add:,}円", f"✅ +{os_bond_add:,}円"])
-    fund_total.extend([f"{us_stock + us_stock_add:,}円", f"{os_reit + os_reit_add:,}円", f"{os_bond + os_bond_add:,}円"])
-
-    funds_df = pd.DataFrame({
-        "ファンド名": fund_names,
-        "通常（15日自動）": fund_regular,
-        "追加（14日手動）": fund_additional,
-        "合計": fund_total
-    })
+# ===== 詳細データ表示 =====
 
-    st.dataframe(funds_df, use_container_width=True, hide_index=True)
+# 判定条件表（3行のみのためDataFrameを使わずMarkdownで描画）
+CONDITIONS_TABLE_HEADER = "| 条件 | 結果 | 値 |\n|---|---|---|\n"
+CONDITION_NAMES = np.array([
+    "VIX > 30", "日本バフェット < 80%", "日経平均 ≤ -20%", "米国バフェット < 80%", "S&P500 ≤ -20%"
+])
+# 各市場の判定に使う条件（VIXは共通）
+JP_CONDITION_ROWS = [0, 1, 2]
+US_CONDITION_ROWS = [0, 3, 4]
+
+def format_conditions_table(names, results, values):
+    return CONDITIONS_TABLE_HEADER + "\n".join(
+        f"| {c} | {r} | {v} |" for c, r, v in zip(names, results, values)
+    )
 
-    os_total_with_crash = os_total + crash_fund_os
-    total_with_crash = base_amount + crash_fund_os
+condition_flags = np.array([
+    vix_condition, buffett_jp_condition, nikkei_condition, buffett_us_condition, sp500_condition
+])
+condition_values = np.array([
+    f"{vix_value:.2f}" if vix_value is not None else "N/A",
+    f"{buffett_jp:.1f}%",
+    f"{nikkei_change:+.2f}%" if nikkei_change is not None else "N/A",
+    f"{buffett_us:.1f}%",
+    f"{sp500_change:+.2f}%" if sp500_change is not None else "N/A"
+])
+
+# 判定結果が変わらない再実行ではセッションから再利用
+conditions_key = (condition_flags.tobytes(), tuple(condition_values))
+conditions_cache = st.session_state.get("conditions_cache")
+
+if conditions_cache is not None and conditions_cache["key"] == conditions_key:
+    jp_conditions_table, us_conditions_table = conditions_cache["tables"]
+else:
+    condition_results = np.where(condition_flags, "✅ 該当", "❌ 非該当")
+    jp_conditions_table, us_conditions_table = (
+        format_conditions_table(CONDITION_NAMES[rows], condition_results[rows], condition_values[rows])
+        for rows in (JP_CONDITION_ROWS, US_CONDITION_ROWS)
+    )
+    st.session_state["conditions_cache"] = {
+        "key": conditions_key,
+        "tables": (jp_conditions_table, us_conditions_table)
+    }
 
-    st.markdown(f"""
-    ### 💰 資産クラス別合計
+# 日本市場
+st.markdown("---\n\n### 📋 判定詳細データ\n\n**🇯🇵 日本市場**\n\n" + jp_conditions_table)
 
-    | 資産クラス | 自動（15日） | 手動（14日） | 合計 |
-    |-----------|------------|------------|------|
-    | 日本資産 | {jp_total:,}円 | － | {jp_total:,}円 |
-    | 海外資産 | {os_total:,}円 | **+{crash_fund_os:,}円** | **{os_total_with_crash:,}円** |
-    | **合計** | {base_amount:,}円 | {crash_fund_os:,}円 | **{total_with_crash:,}円** |
+# 米国市場
+st.markdown("**🇺🇸 米国市場**\n\n" + us_conditions_table)
 
-    **ポイント**: 米国・世界市場が割安なので、暴落用資金（海外分{crash_fund_os:,}円）を追加投資！30:70の比率を維持。
-    """)
+# ===== リバランス計算機 =====
 
-else:
-    # パターン4: 両方暴落
-    pattern = "pattern4"
-    st.error("🚨🚨 **日米両市場とも暴落！全資産に追加投資**")
+# リバランス戦略ごとの説明文（長文のため表示処理から分けて定義）
+INFO_MODE1 = """
+📊 **月次投資額の範囲内で調整**
 
-    st.markdown("""
-    ### 📝 14日の作業（所要時間: 10分）
-    SBI証券にログインして、以下の金額で買付を実行してください。
-    """)
-
-    # 日本資産の追加投資金額を計算
-    jp_stock_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_stock"] / JP_RATIO)
-    jp_reit_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_reit"] / JP_RATIO)
-    jp_bond_add = round_to_1000(crash_fund_jp * FUND_RATIOS["jp_bond"] / JP_RATIO)
-
-    # 海外資産の追加投資金額を計算
-    global_stock_add = round_to_1000(crash_fund_os * FUND_RATIOS["global_stock"] / OS_RATIO)
-    us_stock_add = round_to_1000(crash_fund_os * FUND_RATIOS["us_stock"] / OS_RATIO)
-    os_reit_add = round_to_1000(crash_fund_os * FUND_RATIOS["os_reit"] / OS_RATIO)
-    os_bond_add = round_to_1000(crash_fund_os * FUND_RATIOS["os_bond"] / OS_RATIO)
-
-    # グローバル株式の追加投資をつみたて/成長枠に分割
-    if global_stock_growth > 0:
-        # 既に分割されている場合、比率を維持して分割
-        global_tsumitate_ratio = global_stock_tsumitate / global_stock_total
-        global_stock_add_tsumitate = round_to_1000(global_stock_add * global_tsumitate_ratio)
-        global_stock_add_growth = global_stock_add - global_stock_add_tsumitate
-    else:
-        # 追加投資でつみたて枠を超える場合
-        if global_stock_total + global_stock_add <= TSUMITATE_LIMIT:
-            global_stock_add_tsumitate = global_stock_add
-            global_stock_add_growth = 0
-        else:
-            available_tsumitate = TSUMITATE_LIMIT - global_stock_tsumitate
-            global_stock_add_tsumitate = min(global_stock_add, available_tsumitate)
-            global_stock_add_growth = global_stock_add - global_stock_add_tsumitate
-
-    # 銘柄別買付金額表
-    fund_names = [
-        "eMAXIS Slim 国内株式（TOPIX）",
-        "eMAXIS Slim 国内リートインデックス",
-        "eMAXIS Slim 国内債券インデックス",
-    ]
-    fund_regular = [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"]
-    fund_additional = [f"✅ +{jp_stock_add:,}円", f"✅ +{jp_reit_add:,}円", f"✅ +{jp_bond_add:,}円"]
-    fund_total = [f"{jp_stock + jp_stock_add:,}円", f"{jp_reit + jp_reit_add:,}円", f"{jp_bond + jp_bond_add:,}円"]
-
-    # グローバル株式の処理
-    if global_stock_growth > 0 or global_stock_add_growth > 0:
-        fund_names.extend([
-            "eMAXIS Slim 全世界株式【つみたて投資枠】",
-            "eMAXIS Slim 全世界株式【成長投資枠】"
-        ])
-        fund_regular.extend([f"{global_stock_tsumitate:,}円", f"{global_stock_growth:,}円"])
-        fund_additional.extend([f"✅ +{global_stock_add_tsumitate:,}円" if global_stock_add_tsumitate > 0 else "－",
-                               f"✅ +{global_stock_add_growth:,}円" if global_stock_add_growth > 0 else "－"])
-        fund_total.extend([f"{global_stock_tsumitate + global_stock_add_tsumitate:,}円",
-                          f"{global_stock_growth + global_stock_add_growth:,}円"])
-    else:
-        fund_names.append("eMAXIS Slim 全世界株式（除く日本）")
-        fund_regular.append(f"{global_stock_total:,}円")
-        fund_additional.append(f"✅ +{global_stock_add:,}円")
-        fund_total.append(f"{global_stock_total + global_stock_add:,}円")
-
-    # 残りのファンド
-    fund_names.extend([
-        "eMAXIS Slim 米国株式（S&P500）",
-        "eMAXIS Slim 先進国リートインデックス",
-        "eMAXIS Slim 先進国債券インデックス"
-    ])
-    fund_regular.extend([f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"])
-    fund_additional.extend([f"✅ +{us_stock_add:,}円", f"✅ +{os_reit_add:,}円", f"✅ +{os_bond_add:,}円"])
-    fund_total.extend([f"{us_stock + us_stock_add:,}円", f"{os_reit + os_reit_add:,}円", f"{os_bond + os_bond_add:,}円"])
-
-    funds_df = pd.DataFrame({
-        "ファンド名": fund_names,
-        "通常（15日自動）": fund_regular,
-        "追加（14日手動）": fund_additional,
-        "合計": fund_total
-    })
+通常の月次投資額（{base_amount:,}円）の範囲内で、不足ファンドに重点配分します。
+数ヶ月かけて徐々にバランスを整える方法です。
+"""
 
-    st.dataframe(funds_df, use_container_width=True, hide_index=True)
+WARN_MODE1 = """
+⚠️ **重要な運用手順**
 
-    jp_total_with_crash = jp_total + crash_fund_jp
-    os_total_with_crash = os_total + crash_fund_os
-    total_with_crash = base_amount + base_amount
+この調整後の金額は**推奨継続期間**継続適用します：
 
-    st.markdown(f"""
-    ### 💰 資産クラス別合計
+1. **証券会社で設定変更**: 調整後の金額を設定
+2. **推奨期間継続**: 表示された期間、毎月15日に自動買付
+3. **通常の金額に戻す**: 期間終了後、通常の月次投資額に戻す
 
-    | 資産クラス | 自動（15日） | 手動（14日） | 合計 |
-    |-----------|------------|------------|------|
-    | 日本資産 | {jp_total:,}円 | **+{crash_fund_jp:,}円** | **{jp_total_with_crash:,}円** |
-    | 海外資産 | {os_total:,}円 | **+{crash_fund_os:,}円** | **{os_total_with_crash:,}円** |
-    | **合計** | {base_amount:,}円 | {base_amount:,}円 | **{total_with_crash:,}円** |
+💡 **推奨**: カレンダーに「○ヶ月後に設定を戻す」リマインダーを設定
+"""
 
-    **ポイント**: 日米両市場が割安！全資産に通常配分で追加投資！
-    """)
+INFO_MODE2 = """
+💰 **追加資金でリバランス**
 
-st.markdown("---")
+通常の月次投資額に加えて、追加資金を投入することで、
+**次回1回の買付で**バランスを大きく改善します。
+"""
 
-# ===== 詳細データ表示 =====
-st.subheader("📋 判定詳細データ")
+WARN_MODE2 = """
+⚠️ **重要な運用手順**
 
-# 日本市場
-st.markdown("**🇯🇵 日本市場**")
-jp_conditions_df = pd.DataFrame({
-    "条件": ["VIX > 30", "日本バフェット < 80%", "日経平均 ≤ -20%"],
-    "結果": [
-        "✅ 該当" if vix_condition else "❌ 非該当",
-        "✅ 該当" if buffett_jp_condition else "❌ 非該当",
-        "✅ 該当" if nikkei_condition else "❌ 非該当"
-    ],
-    "値": [
-        f"{vix_value:.2f}" if vix_value is not None else "N/A",
-        f"{buffett_jp:.1f}%",
-        f"{nikkei_change:+.2f}%" if nikkei_change is not None else "N/A"
-    ]
-})
-st.dataframe(jp_conditions_df, use_container_width=True)
+追加資金は**次回1回だけ**に適用します：
 
-# 米国市場
-st.markdown("**🇺🇸 米国市場**")
-us_conditions_df = pd.DataFrame({
-    "条件": ["VIX > 30", "米国バフェット < 80%", "S&P500 ≤ -20%"],
-    "結果": [
-        "✅ 該当" if vix_condition else "❌ 非該当",
-        "✅ 該当" if buffett_us_condition else "❌ 非該当",
-        "✅ 該当" if sp500_condition else "❌ 非該当"
-    ],
-    "値": [
-        f"{vix_value:.2f}" if vix_value is not None else "N/A",
-        f"{buffett_us:.1f}%",
-        f"{sp500_change:+.2f}%" if sp500_change is not None else "N/A"
-    ]
-})
-st.dataframe(us_conditions_df, use_container_width=True)
+1. **証券会社で設定変更**: 次回買付のみ、調整後の金額を設定
+2. **買付完了を待つ**: 15日の自動買付が完了するのを確認
+3. **通常の金額に戻す**: 買付完了後、すぐに通常の月次投資額に戻す
 
-st.markdown("---")
+⚠️ **戻し忘れると**: 継続的に偏った投資になります！
 
-# ===== リバランス計算機 =====
-st.subheader("⚖️ ポートフォリオ・リバランス計算機")
+💡 **推奨**: カレンダーに「買付完了後に設定を戻す」リマインダーを設定
+"""
 
 st.markdown("""
+---
+
+### ⚖️ ポートフォリオ・リバランス計算機
+
 片方の市場のみ暴落した場合、30:70のバランスが崩れます。
 各ファンドの現在残高を入力して、理想比率に戻すための調整額を計算できます。
+
+### 📊 現在の保有残高（銘柄別）
 """)
 
-# 銘柄別残高入力
-st.markdown("### 📊 現在の保有残高（銘柄別）")
+# 入力途中で再実行しないよう、フォームでまとめて送信
+with st.form("rebal_form"):
+    col_jp_funds, col_os_funds = st.columns(2)
 
-col_jp_funds, col_os_funds = st.columns(2)
+    with col_jp_funds:
+        st.markdown("**🇯🇵 日本資産**")
 
-with col_jp_funds:
-    st.markdown("**🇯🇵 日本資産**")
+        current_jp_stock = st.number_input(
+            "国内株式（TOPIX）",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_jp_stock"
+        )
 
-    current_jp_stock = st.number_input(
-        "国内株式（TOPIX）",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_jp_stock"
-    )
+        current_jp_reit = st.number_input(
+            "国内REIT",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_jp_reit"
+        )
 
-    current_jp_reit = st.number_input(
-        "国内REIT",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_jp_reit"
-    )
+        current_jp_bond = st.number_input(
+            "国内債券",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_jp_bond"
+        )
 
-    current_jp_bond = st.number_input(
-        "国内債券",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_jp_bond"
-    )
+    with col_os_funds:
+        st.markdown("**🇺🇸 海外資産**")
 
-with col_os_funds:
-    st.markdown("**🇺🇸 海外資産**")
+        current_global_stock = st.number_input(
+            "全世界株式（除く日本）",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_global"
+        )
 
-    current_global_stock = st.number_input(
-        "全世界株式（除く日本）",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_global"
-    )
+        current_us_stock = st.number_input(
+            "米国株式（S&P500）",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_us"
+        )
 
-    current_us_stock = st.number_input(
-        "米国株式（S&P500）",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_us"
-    )
+        current_os_reit = st.number_input(
+            "先進国REIT",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_os_reit"
+        )
 
-    current_os_reit = st.number_input(
-        "先進国REIT",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_os_reit"
-    )
+        current_os_bond = st.number_input(
+            "先進国債券",
+            min_value=0,
+            max_value=100000000,
+            value=0,
+            step=1000,
+            key="rebal_os_bond"
+        )
 
-    current_os_bond = st.number_input(
-        "先進国債券",
-        min_value=0,
-        max_value=100000000,
-        value=0,
-        step=1000,
-        key="rebal_os_bond"
-    )
+    st.form_submit_button("リバランスを計算")
 
 # 合計を計算
 current_jp = current_jp_stock + current_jp_reit + current_jp_bond
@@ -819,23 +1062,17 @@ if current_jp > 0 or current_os > 0:
                 delta_color="inverse"
             )
 
-        # 目標金額（各ファンド）
-        target_jp_stock = round_to_1000(total_current * FUND_RATIOS["jp_stock"])
-        target_jp_reit = round_to_1000(total_current * FUND_RATIOS["jp_reit"])
-        target_jp_bond = round_to_1000(total_current * FUND_RATIOS["jp_bond"])
-        target_global_stock = round_to_1000(total_current * FUND_RATIOS["global_stock"])
-        target_us_stock = round_to_1000(total_current * FUND_RATIOS["us_stock"])
-        target_os_reit = round_to_1000(total_current * FUND_RATIOS["os_reit"])
-        target_os_bond = round_to_1000(total_current * FUND_RATIOS["os_bond"])
-
-        # 各ファンドの調整額
-        adjust_jp_stock = target_jp_stock - current_jp_stock
-        adjust_jp_reit = target_jp_reit - current_jp_reit
-        adjust_jp_bond = target_jp_bond - current_jp_bond
-        adjust_global_stock = target_global_stock - current_global_stock
-        adjust_us_stock = target_us_stock - current_us_stock
-        adjust_os_reit = target_os_reit - current_os_reit
-        adjust_os_bond = target_os_bond - current_os_bond
+        # 目標金額と調整額（各ファンド）
+        current_array = np.array([
+            current_jp_stock, current_jp_reit, current_jp_bond,
+            current_global_stock, current_us_stock, current_os_reit, current_os_bond
+        ], dtype=np.int64)
+        target_array, adjust_array = compute_rebalance_targets(current_array, total_current)
+
+        (target_jp_stock, target_jp_reit, target_jp_bond, target_global_stock,
+         target_us_stock, target_os_reit, target_os_bond) = target_array.tolist()
+        (adjust_jp_stock, adjust_jp_reit, adjust_jp_bond, adjust_global_stock,
+         adjust_us_stock, adjust_os_reit, adjust_os_bond) = adjust_array.tolist()
 
         # リバランス提案
         st.markdown("### 📊 リバランス提案（銘柄別）")
@@ -856,12 +1093,13 @@ if current_jp > 0 or current_os > 0:
 
         st.markdown("---")
 
-        # 銘柄別の詳細表示
-        col_jp_rebal, col_os_rebal = st.columns(2)
-
-        with col_jp_rebal:
-            st.markdown("**🇯🇵 日本資産の調整**")
+        # 表示用DataFrame（保有残高が変わらない再実行ではセッションから再利用）
+        rebal_key = tuple(current_array.tolist())
+        rebal_cache = st.session_state.get("rebal_cache")
 
+        if rebal_cache is not None and rebal_cache["key"] == rebal_key:
+            jp_rebal_df, os_rebal_df, buy_df, total_buy = rebal_cache["dfs"]
+        else:
             jp_rebal_df = pd.DataFrame({
                 "ファンド": ["国内株式", "国内REIT", "国内債券"],
                 "現在": [f"{current_jp_stock:,}円", f"{current_jp_reit:,}円", f"{current_jp_bond:,}円"],
@@ -872,10 +1110,6 @@ if current_jp > 0 or current_os > 0:
                     f"{adjust_jp_bond:+,}円" if abs(adjust_jp_bond) >= 1000 else "±0円"
                 ]
             })
-            st.dataframe(jp_rebal_df, use_container_width=True, hide_index=True)
-
-        with col_os_rebal:
-            st.markdown("**🇺🇸 海外資産の調整**")
 
             os_rebal_df = pd.DataFrame({
                 "ファンド": ["全世界株式", "米国株式", "先進国REIT", "先進国債券"],
@@ -898,416 +1132,222 @@ if current_jp > 0 or current_os > 0:
                     f"{adjust_os_bond:+,}円" if abs(adjust_os_bond) >= 1000 else "±0円"
                 ]
             })
+
+            # 追加購入が必要なファンド
+            buy_needed = []
+
+            if adjust_jp_stock >= 1000:
+                buy_needed.append(("eMAXIS Slim 国内株式（TOPIX）", adjust_jp_stock))
+            if adjust_jp_reit >= 1000:
+                buy_needed.append(("eMAXIS Slim 国内リートインデックス", adjust_jp_reit))
+            if adjust_jp_bond >= 1000:
+                buy_needed.append(("eMAXIS Slim 国内債券インデックス", adjust_jp_bond))
+            if adjust_global_stock >= 1000:
+                buy_needed.append(("eMAXIS Slim 全世界株式（除く日本）", adjust_global_stock))
+            if adjust_us_stock >= 1000:
+                buy_needed.append(("eMAXIS Slim 米国株式（S&P500）", adjust_us_stock))
+            if adjust_os_reit >= 1000:
+                buy_needed.append(("eMAXIS Slim 先進国リートインデックス", adjust_os_reit))
+            if adjust_os_bond >= 1000:
+                buy_needed.append(("eMAXIS Slim 先進国債券インデックス", adjust_os_bond))
+
+            if buy_needed:
+                buy_df = pd.DataFrame(buy_needed, columns=["ファンド名", "追加購入額"])
+                buy_df["追加購入額"] = buy_df["追加購入額"].apply(lambda x: f"{x:,}円")
+                total_buy = sum(map(itemgetter(1), buy_needed))
+            else:
+                buy_df = None
+                total_buy = 0
+
+            st.session_state["rebal_cache"] = {
+                "key": rebal_key,
+                "dfs": (jp_rebal_df, os_rebal_df, buy_df, total_buy)
+            }
+
+        # 銘柄別の詳細表示
+        col_jp_rebal, col_os_rebal = st.columns(2)
+
+        with col_jp_rebal:
+            st.markdown("**🇯🇵 日本資産の調整**")
+            st.dataframe(jp_rebal_df, use_container_width=True, hide_index=True)
+
+        with col_os_rebal:
+            st.markdown("**🇺🇸 海外資産の調整**")
             st.dataframe(os_rebal_df, use_container_width=True, hide_index=True)
 
         # 追加購入が必要なファンドのみリスト表示
         st.markdown("### 💰 追加購入が必要なファンド")
 
-        buy_needed = []
-
-        if adjust_jp_stock >= 1000:
-            buy_needed.append(("eMAXIS Slim 国内株式（TOPIX）", adjust_jp_stock))
-        if adjust_jp_reit >= 1000:
-            buy_needed.append(("eMAXIS Slim 国内リートインデックス", adjust_jp_reit))
-        if adjust_jp_bond >= 1000:
-            buy_needed.append(("eMAXIS Slim 国内債券インデックス", adjust_jp_bond))
-        if adjust_global_stock >= 1000:
-            buy_needed.append(("eMAXIS Slim 全世界株式（除く日本）", adjust_global_stock))
-        if adjust_us_stock >= 1000:
-            buy_needed.append(("eMAXIS Slim 米国株式（S&P500）", adjust_us_stock))
-        if adjust_os_reit >= 1000:
-            buy_needed.append(("eMAXIS Slim 先進国リートインデックス", adjust_os_reit))
-        if adjust_os_bond >= 1000:
-            buy_needed.append(("eMAXIS Slim 先進国債券インデックス", adjust_os_bond))
-
-        if buy_needed:
-            buy_df = pd.DataFrame(buy_needed, columns=["ファンド名", "追加購入額"])
-            buy_df["追加購入額"] = buy_df["追加購入額"].apply(lambda x: f"{x:,}円")
+        if buy_df is not None:
             st.dataframe(buy_df, use_container_width=True, hide_index=True)
-
-            total_buy = sum([amount for _, amount in buy_needed])
             st.info(f"**合計追加購入額**: {total_buy:,}円")
         else:
             st.success("✅ 追加購入が必要なファンドはありません")
 
         # リバランスを反映した次回投資額
-        st.markdown("---")
-        st.markdown("### 🎯 リバランスを考慮した次回投資プラン")
-
         st.markdown("""
+        ---
+
+        ### 🎯 リバランスを考慮した次回投資プラン
+
         現在の残高バランスを考慮して、次回の月次投資額を調整できます。
         不足しているファンドに重点的に投資し、徐々にバランスを整えます。
         """)
 
-        # リバランス戦略の選択
-        rebalance_mode = st.radio(
-            "リバランス戦略を選択してください",
-            ["月次投資額の範囲内で調整", "追加資金でリバランス"],
-            help="「月次投資額の範囲内」は数ヶ月かけて調整、「追加資金」は一度に不足を解消します。"
-        )
-
-        if rebalance_mode == "月次投資額の範囲内で調整":
-            st.info("""
-            📊 **月次投資額の範囲内で調整**
-
-            通常の月次投資額（{:,}円）の範囲内で、不足ファンドに重点配分します。
-            数ヶ月かけて徐々にバランスを整える方法です。
-            """.format(base_amount))
-
-            st.warning("""
-            ⚠️ **重要な運用手順**
-
-            この調整後の金額は**推奨継続期間**継続適用します：
-
-            1. **証券会社で設定変更**: 調整後の金額を設定
-            2. **推奨期間継続**: 表示された期間、毎月15日に自動買付
-            3. **通常の金額に戻す**: 期間終了後、通常の月次投資額に戻す
-
-            💡 **推奨**: カレンダーに「○ヶ月後に設定を戻す」リマインダーを設定
-            """)
-
-            # 最低購入金額の設定
-            min_purchase = st.number_input(
-                "各ファンドの最低購入金額（円）",
-                min_value=1000,
-                max_value=50000,
-                value=3000,
-                step=1000,
-                help="全てのファンドで最低限購入する金額。分散投資を維持するため、0円にはなりません。"
+        # 計算は必要なときだけ実行（チェックするまで入力欄も表示しない）
+        if st.checkbox("リバランスを計算する", value=False):
+            # リバランス戦略の選択
+            rebalance_mode = st.radio(
+                "リバランス戦略を選択してください",
+                ["月次投資額の範囲内で調整", "追加資金でリバランス"],
+                help="「月次投資額の範囲内」は数ヶ月かけて調整、「追加資金」は一度に不足を解消します。"
             )
 
-        else:  # 追加資金でリバランス
-            st.info("""
-            💰 **追加資金でリバランス**
-
-            通常の月次投資額に加えて、追加資金を投入することで、
-            **次回1回の買付で**バランスを大きく改善します。
-            """)
-
-            st.warning("""
-            ⚠️ **重要な運用手順**
-
-            追加資金は**次回1回だけ**に適用します：
-
-            1. **証券会社で設定変更**: 次回買付のみ、調整後の金額を設定
-            2. **買付完了を待つ**: 15日の自動買付が完了するのを確認
-            3. **通常の金額に戻す**: 買付完了後、すぐに通常の月次投資額に戻す
-
-            ⚠️ **戻し忘れると**: 継続的に偏った投資になります！
-
-            💡 **推奨**: カレンダーに「買付完了後に設定を戻す」リマインダーを設定
-            """)
-
-            # 追加投資額の入力
-            additional_amount = st.number_input(
-                "追加投資額（円）",
-                min_value=0,
-                max_value=10000000,
-                value=100000,
-                step=10000,
-                help="通常の月次投資額に追加して投入する金額。不足ファンドに優先配分されます。"
-            )
-
-            # 最低購入金額の設定
-            min_purchase = st.number_input(
-                "各ファンドの最低購入金額（円）",
-                min_value=1000,
-                max_value=50000,
-                value=3000,
-                step=1000,
-                help="全てのファンドで最低限購入する金額。分散投資を維持するため、0円にはなりません。"
-            )
-
-        # 次回投資額を計算
-        # 不足しているファンドのリストアップ
-        shortage_funds = []
-        if adjust_jp_stock > 0:
-            shortage_funds.append(("jp_stock", adjust_jp_stock))
-        if adjust_jp_reit > 0:
-            shortage_funds.append(("jp_reit", adjust_jp_reit))
-        if adjust_jp_bond > 0:
-            shortage_funds.append(("jp_bond", adjust_jp_bond))
-        if adjust_global_stock > 0:
-            shortage_funds.append(("global_stock", adjust_global_stock))
-        if adjust_us_stock > 0:
-            shortage_funds.append(("us_stock", adjust_us_stock))
-        if adjust_os_reit > 0:
-            shortage_funds.append(("os_reit", adjust_os_reit))
-        if adjust_os_bond > 0:
-            shortage_funds.append(("os_bond", adjust_os_bond))
-
-        if shortage_funds:
-            # 不足額の合計
-            total_shortage = sum([amount for _, amount in shortage_funds])
-
             if rebalance_mode == "月次投資額の範囲内で調整":
-                # モード1: 月次投資額の範囲内で調整
-                # ベース金額から最低購入金額×7を引いた配分可能額
-                min_total = min_purchase * 7
-                if base_amount > min_total:
-                    allocatable = base_amount - min_total
-
-                    # 各ファンドの次回投資額を計算
-                    next_jp_stock = min_purchase
-                    next_jp_reit = min_purchase
-                    next_jp_bond = min_purchase
-                    next_global_stock = min_purchase
-                    next_us_stock = min_purchase
-                    next_os_reit = min_purchase
-                    next_os_bond = min_purchase
-
-                    # 不足しているファンドに配分可能額を振り分け
-                    for fund_name, shortage in shortage_funds:
-                        # 不足額の比率に応じて配分
-                        ratio = shortage / total_shortage
-                        additional = round_to_1000(allocatable * ratio)
-
-                        if fund_name == "jp_stock":
-                            next_jp_stock += additional
-                        elif fund_name == "jp_reit":
-                            next_jp_reit += additional
-                        elif fund_name == "jp_bond":
-                            next_jp_bond += additional
-                        elif fund_name == "global_stock":
-                            next_global_stock += additional
-                        elif fund_name == "us_stock":
-                            next_us_stock += additional
-                        elif fund_name == "os_reit":
-                            next_os_reit += additional
-                        elif fund_name == "os_bond":
-                            next_os_bond += additional
-
-                    # 端数調整（合計がbase_amountになるように）
-                    calculated_total = (next_jp_stock + next_jp_reit + next_jp_bond +
-                                       next_global_stock + next_us_stock + next_os_reit + next_os_bond)
-                    diff = base_amount - calculated_total
-
-                    # 最も不足しているファンドに端数を追加
-                    if diff != 0 and shortage_funds:
-                        largest_shortage_fund = max(shortage_funds, key=lambda x: x[1])[0]
-                        if largest_shortage_fund == "jp_stock":
-                            next_jp_stock += diff
-                        elif largest_shortage_fund == "jp_reit":
-                            next_jp_reit += diff
-                        elif largest_shortage_fund == "jp_bond":
-                            next_jp_bond += diff
-                        elif largest_shortage_fund == "global_stock":
-                            next_global_stock += diff
-                        elif largest_shortage_fund == "us_stock":
-                            next_us_stock += diff
-                        elif largest_shortage_fund == "os_reit":
-                            next_os_reit += diff
-                        elif largest_shortage_fund == "os_bond":
-                            next_os_bond += diff
-
-                    total_investment = base_amount
-
-                else:
-                    st.warning(f"⚠️ ベース金額（{base_amount:,}円）が最低購入金額の合計（{min_total:,}円）より小さいため、調整できません。")
-                    st.stop()
+                st.info(INFO_MODE1.format(base_amount=base_amount))
+
+                st.warning(WARN_MODE1)
 
             else:  # 追加資金でリバランス
-                # モード2: 追加資金でリバランス
-                # 通常の月次投資額は通常通り配分
-                next_jp_stock = jp_stock
-                next_jp_reit = jp_reit
-                next_jp_bond = jp_bond
-                next_global_stock = global_stock_total
-                next_us_stock = us_stock
-                next_os_reit = os_reit
-                next_os_bond = os_bond
-
-                # 追加資金を不足ファンドに比例配分
-                for fund_name, shortage in shortage_funds:
-                    # 不足額の比率に応じて追加資金を配分
-                    ratio = shortage / total_shortage
-                    additional = round_to_1000(additional_amount * ratio)
-
-                    if fund_name == "jp_stock":
-                        next_jp_stock += additional
-                    elif fund_name == "jp_reit":
-                        next_jp_reit += additional
-                    elif fund_name == "jp_bond":
-                        next_jp_bond += additional
-                    elif fund_name == "global_stock":
-                        next_global_stock += additional
-                    elif fund_name == "us_stock":
-                        next_us_stock += additional
-                    elif fund_name == "os_reit":
-                        next_os_reit += additional
-                    elif fund_name == "os_bond":
-                        next_os_bond += additional
-
-                # 端数調整（合計がbase_amount + additional_amountになるように）
-                calculated_total = (next_jp_stock + next_jp_reit + next_jp_bond +
-                                   next_global_stock + next_us_stock + next_os_reit + next_os_bond)
-                target_total = base_amount + additional_amount
-                diff = target_total - calculated_total
-
-                # 最も不足しているファンドに端数を追加
-                if diff != 0 and shortage_funds:
-                    largest_shortage_fund = max(shortage_funds, key=lambda x: x[1])[0]
-                    if largest_shortage_fund == "jp_stock":
-                        next_jp_stock += diff
-                    elif largest_shortage_fund == "jp_reit":
-                        next_jp_reit += diff
-                    elif largest_shortage_fund == "jp_bond":
-                        next_jp_bond += diff
-                    elif largest_shortage_fund == "global_stock":
-                        next_global_stock += diff
-                    elif largest_shortage_fund == "us_stock":
-                        next_us_stock += diff
-                    elif largest_shortage_fund == "os_reit":
-                        next_os_reit += diff
-                    elif largest_shortage_fund == "os_bond":
-                        next_os_bond += diff
-
-                total_investment = target_total
-
-            # 次回投資額の表示（両モード共通）
-            col_next_jp, col_next_os = st.columns(2)
-
-            with col_next_jp:
-                st.markdown("**🇯🇵 日本資産**")
-                next_jp_df = pd.DataFrame({
-                    "ファンド": ["国内株式", "国内REIT", "国内債券"],
-                    "通常配分": [f"{jp_stock:,}円", f"{jp_reit:,}円", f"{jp_bond:,}円"],
-                    "調整後": [f"{next_jp_stock:,}円", f"{next_jp_reit:,}円", f"{next_jp_bond:,}円"],
-                    "差分": [
-                        f"{next_jp_stock - jp_stock:+,}円",
-                        f"{next_jp_reit - jp_reit:+,}円",
-                        f"{next_jp_bond - jp_bond:+,}円"
-                    ]
-                })
-                st.dataframe(next_jp_df, use_container_width=True, hide_index=True)
-
-            with col_next_os:
-                st.markdown("**🇺🇸 海外資産**")
-                next_os_df = pd.DataFrame({
-                    "ファンド": ["全世界株式", "米国株式", "先進国REIT", "先進国債券"],
-                    "通常配分": [f"{global_stock_total:,}円", f"{us_stock:,}円", f"{os_reit:,}円", f"{os_bond:,}円"],
-                    "調整後": [
-                        f"{next_global_stock:,}円",
-                        f"{next_us_stock:,}円",
-                        f"{next_os_reit:,}円",
-                        f"{next_os_bond:,}円"
-                    ],
-                    "差分": [
-                        f"{next_global_stock - global_stock_total:+,}円",
-                        f"{next_us_stock - us_stock:+,}円",
-                        f"{next_os_reit - os_reit:+,}円",
-                        f"{next_os_bond - os_bond:+,}円"
-                    ]
-                })
-                st.dataframe(next_os_df, use_container_width=True, hide_index=True)
-
-            # サマリー
-            next_jp_total = next_jp_stock + next_jp_reit + next_jp_bond
-            next_os_total = next_global_stock + next_us_stock + next_os_reit + next_os_bond
-
-            # 必要な継続期間を計算
-            months_needed = []
-            fund_details = []
-
-            # 各不足ファンドの必要月数を計算
-            if adjust_jp_stock > 0:
-                additional = next_jp_stock - jp_stock
-                if additional > 0:
-                    months = int(adjust_jp_stock / additional) + (1 if adjust_jp_stock % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"国内株式: {months}ヶ月")
-
-            if adjust_jp_reit > 0:
-                additional = next_jp_reit - jp_reit
-                if additional > 0:
-                    months = int(adjust_jp_reit / additional) + (1 if adjust_jp_reit % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"国内REIT: {months}ヶ月")
-
-            if adjust_jp_bond > 0:
-                additional = next_jp_bond - jp_bond
-                if additional > 0:
-                    months = int(adjust_jp_bond / additional) + (1 if adjust_jp_bond % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"国内債券: {months}ヶ月")
-
-            if adjust_global_stock > 0:
-                additional = next_global_stock - global_stock_total
-                if additional > 0:
-                    months = int(adjust_global_stock / additional) + (1 if adjust_global_stock % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"全世界株式: {months}ヶ月")
-
-            if adjust_us_stock > 0:
-                additional = next_us_stock - us_stock
-                if additional > 0:
-                    months = int(adjust_us_stock / additional) + (1 if adjust_us_stock % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"米国株式: {months}ヶ月")
-
-            if adjust_os_reit > 0:
-                additional = next_os_reit - os_reit
-                if additional > 0:
-                    months = int(adjust_os_reit / additional) + (1 if adjust_os_reit % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"先進国REIT: {months}ヶ月")
-
-            if adjust_os_bond > 0:
-                additional = next_os_bond - os_bond
-                if additional > 0:
-                    months = int(adjust_os_bond / additional) + (1 if adjust_os_bond % additional > 0 else 0)
-                    months_needed.append(months)
-                    fund_details.append(f"先進国債券: {months}ヶ月")
-
-            # 最大月数を取得
-            max_months = max(months_needed) if months_needed else 0
-
-            # モードに応じたサマリー表示
-            if rebalance_mode == "月次投資額の範囲内で調整":
-                st.info(f"""
-                **📊 次回投資額サマリー:**
-                - 日本資産: {next_jp_total:,}円
-                - 海外資産: {next_os_total:,}円
-                - 合計: {total_investment:,}円
+                st.info(INFO_MODE2)
+
+                st.warning(WARN_MODE2)
+
+            # 金額の入力途中で再実行しないよう、フォームでまとめて送信
+            with st.form("rebalance_form"):
+                # 最低購入金額の設定
+                min_purchase = st.number_input(
+                    "各ファンドの最低購入金額（円）",
+                    min_value=1000,
+                    max_value=50000,
+                    value=3000,
+                    step=1000,
+                    help="全てのファンドで最低限購入する金額。分散投資を維持するため、0円にはなりません。"
+                )
 
-                この配分で投資すると、{len(shortage_funds)}個の不足ファンドのバランスが徐々に改善されます。
-                """)
+                if rebalance_mode == "月次投資額の範囲内で調整":
+                    # このモードでは追加資金を使わない
+                    additional_amount = 0
+
+                else:  # 追加資金でリバランス
+                    # 追加投資額の入力
+                    additional_amount = st.number_input(
+                        "追加投資額（円）",
+                        min_value=10000,
+                        max_value=10000000,
+                        value=100000,
+                        step=10000,
+                        help="通常の月次投資額に追加して投入する金額（1万円以上）。不足ファンドに優先配分されます。"
+                    )
+
+                st.form_submit_button("次回投資額を計算")
+
+            # 次回投資額を計算
+            # 不足しているファンドのリストアップ
+            shortage_array = np.maximum(adjust_array, 0)
+
+            if shortage_array.any():
+                # 不足額の合計
+                total_shortage = int(shortage_array.sum())
+
+                if rebalance_mode == "月次投資額の範囲内で調整":
+                    # ベース金額が最低購入金額×7以下なら調整できない
+                    min_total = min_purchase * len(FUND_KEYS)
+                    if base_amount <= min_total:
+                        st.warning(f"⚠️ ベース金額（{base_amount:,}円）が最低購入金額の合計（{min_total:,}円）より小さいため、調整できません。")
+                        st.stop()
+
+                rebalance = compute_rebalance(
+                    rebalance_mode, base_amount, min_purchase, additional_amount, tuple(current_array.tolist()),
+                    tuple(shortage_array.tolist()), tuple(base_allocation.tolist())
+                )
+                total_investment = rebalance["total_investment"]
 
-                if max_months > 0:
-                    st.success(f"""
-                    ⏱️ **推奨継続期間: {max_months}ヶ月**
+                (next_jp_stock, next_jp_reit, next_jp_bond, next_global_stock,
+                 next_us_stock, next_os_reit, next_os_bond) = rebalance["next"].values()
 
-                    この調整後の金額で**約{max_months}ヶ月間**継続して買付することで、
-                    全ての不足ファンドが目標バランスに到達します。
+                # 次回投資額の表（両モード共通）
+                # 数値のまま1つの表にまとめ、表示時に書式を適用
+                next_df = build_next_df(
+                    tuple(FUND_LABELS.values()), tuple(base_allocation.tolist()), tuple(rebalance["next"].values())
+                )
+                next_format = {"通常配分": "{:,}円", "調整後": "{:,}円", "差分": "{:+,}円"}
+                next_jp_styler = next_df[JP_FUND_MASK].style.format(next_format)
+                next_os_styler = next_df[~JP_FUND_MASK].style.format(next_format)
+
+                # サマリー
+                next_jp_total = next_jp_stock + next_jp_reit + next_jp_bond
+                next_os_total = next_global_stock + next_us_stock + next_os_reit + next_os_bond
+
+                # 必要な継続期間
+                max_months = rebalance["max_months"]
+                fund_details_text = "\n".join(f"- {detail}" for detail in rebalance["fund_details"])
+
+                # 増額されない不足ファンドがある場合は、改善の対象範囲を明示する
+                unfunded = rebalance["unfunded"]
+                improved_count = rebalance["improved_count"]
+                improved_funds = "全ての不足ファンド" if not unfunded else "増額した不足ファンド"
+                unfunded_text = None
+                if unfunded:
+                    unfunded_names = "、".join(unfunded)
+                    if rebalance_mode == "月次投資額の範囲内で調整":
+                        unfunded_reason = "不足額が小さく、最低購入金額と配分額の合計が通常配分に届かないため"
+                        recompute_timing = "期間終了後"
+                    else:
+                        unfunded_reason = "より不足の大きいファンドを優先して追加資金を配分したため"
+                        recompute_timing = "次回の買付後"
+                    unfunded_text = f"""
+                    ⚠️ **今回の配分では増額されない不足ファンドがあります**
+
+                    {unfunded_names}は不足していますが、{unfunded_reason}、
+                    通常配分より多くは買付されません。
+                    {recompute_timing}に残高を入力し直して再計算してください。
+                    """
+
+                # モードに応じた表示内容を先に組み立てる
+                status = None
+                if rebalance_mode == "月次投資額の範囲内で調整":
+                    summary_text = f"""
+                    **📊 次回投資額サマリー:**
+                    - 日本資産: {next_jp_total:,}円
+                    - 海外資産: {next_os_total:,}円
+                    - 合計: {total_investment:,}円
+
+                    この配分で投資すると、{improved_count}個の不足ファンドのバランスが徐々に改善されます。
+                    """
+
+                    if max_months > 0:
+                        status = (st.success, f"""
+                        ⏱️ **推奨継続期間: {max_months}ヶ月**
+
+                        この調整後の金額で**約{max_months}ヶ月間**継続して買付することで、
+                        {improved_funds}が目標バランスに到達します。
 
-                    📅 **手順:**
-                    1. 証券会社で調整後の金額に設定変更
-                    2. {max_months}ヶ月間、毎月15日の自動買付を継続
-                    3. {max_months}ヶ月後、通常の{base_amount:,}円に戻す
-                    4. カレンダーに「{max_months}ヶ月後に設定を戻す」とリマインダー設定
-                    """)
+                        📅 **手順:**
+                        1. 証券会社で調整後の金額に設定変更
+                        2. {max_months}ヶ月間、毎月15日の自動買付を継続
+                        3. {max_months}ヶ月後、通常の{base_amount:,}円に戻す
+                        4. カレンダーに「{max_months}ヶ月後に設定を戻す」とリマインダー設定
+                        """)
 
-                    # 各ファンドの詳細を展開可能にする
-                    with st.expander("📋 各ファンドの必要月数（詳細）"):
-                        for detail in fund_details:
-                            st.write(f"- {detail}")
+                    # 各ファンドの詳細は推奨継続期間か増額されないファンドがある場合のみ
+                    details_title = "📋 各ファンドの必要月数（詳細）" if max_months > 0 or unfunded else None
 
-            else:  # 追加資金でリバランス
-                st.info(f"""
-                **📊 次回投資額サマリー:**
-                - 日本資産: {next_jp_total:,}円
-                - 海外資産: {next_os_total:,}円
-                - **合計: {total_investment:,}円** （通常 {base_amount:,}円 + 追加 {additional_amount:,}円）
+                else:  # 追加資金でリバランス
+                    summary_text = f"""
+                    **📊 次回投資額サマリー:**
+                    - 日本資産: {next_jp_total:,}円
+                    - 海外資産: {next_os_total:,}円
+                    - **合計: {total_investment:,}円** （通常 {base_amount:,}円 + 追加 {additional_amount:,}円）
 
-                追加資金{additional_amount:,}円を不足ファンドに配分します。
-                """)
+                    追加資金{additional_amount:,}円を不足ファンドに配分します。
+                    """
 
-                if max_months > 0:
                     if max_months == 1:
-                        st.success(f"""
+                        status = (st.success, f"""
                         ✅ **次回1回の買付で完了**
 
-                        この金額で買付することで、全ての不足ファンドのバランスが改善されます。
+                        この金額で買付することで、{improved_funds}のバランスが改善されます。
 
                         📅 **手順:**
                         1. 証券会社で次回買付のみ、{total_investment:,}円に設定変更
@@ -1315,8 +1355,8 @@ if current_jp > 0 or current_os > 0:
                         3. 買付完了後、すぐに通常の{base_amount:,}円に戻す
                         4. カレンダーに「買付完了後に設定を戻す」リマインダー設定
                         """)
-                    else:
-                        st.warning(f"""
+                    elif max_months > 1:
+                        status = (st.warning, f"""
                         ⚠️ **追加資金が不足しています**
 
                         現在の追加資金では、約{max_months}回の買付が必要です。
@@ -1326,16 +1366,40 @@ if current_jp > 0 or current_os > 0:
                         - または「月次投資額の範囲内で調整」モードを使用
                         """)
 
-                # 各ファンドの詳細を展開可能にする
-                with st.expander("📋 各ファンドへの配分詳細"):
-                    for detail in fund_details:
-                        st.write(f"- {detail}")
-        else:
-            st.success("✅ バランスが良好なため、通常の配分で投資してください。")
+                    details_title = "📋 各ファンドへの配分詳細"
+
+                # 組み立てた内容をまとめて描画
+                with st.container():
+                    col_next_jp, col_next_os = st.columns(2)
+
+                    with col_next_jp:
+                        st.markdown("**🇯🇵 日本資産**")
+                        st.dataframe(next_jp_styler, use_container_width=True, hide_index=True)
+
+                    with col_next_os:
+                        st.markdown("**🇺🇸 海外資産**")
+                        st.dataframe(next_os_styler, use_container_width=True, hide_index=True)
+
+                    st.info(summary_text)
+
+                    if status is not None:
+                        render_status, status_text = status
+                        render_status(status_text)
+
+                    if unfunded_text is not None:
+                        st.warning(unfunded_text)
+
+                    # 各ファンドの詳細を展開可能にする
+                    if details_title is not None:
+                        with st.expander(details_title):
+                            st.markdown(fund_details_text)
+            else:
+                st.success("✅ バランスが良好なため、通常の配分で投資してください。")
 
 # ===== Discord通知セクション =====
-st.markdown("---")
-st.subheader("📱 Discord通知")
+st.markdown("---\n\n### 📱 Discord通知")
+
+discord_future = None
 
 # Discord Webhook URLが設定されているかチェック
 if "discord_webhook_url" in st.secrets:
@@ -1345,38 +1409,37 @@ if "discord_webhook_url" in st.secrets:
     if "last_sent_message" not in st.session_state:
         st.session_state.last_sent_message = None
 
-    # 判定結果メッセージを生成
-    message = f"""📊 **Plan C 暴落判定結果**
-判定日: {today}
-
-**【市場状況】**
-VIX指数: {vix_value:.2f}
-日本市場: {"🚨 暴落" if jp_crash else "✅ 通常"}
-米国市場: {"🚨 暴落" if us_crash else "✅ 通常"}
-
-**【最終判定】**
-"""
+    # 判定結果メッセージを生成（行のリストを最後に結合）
+    lines = [
+        "📊 **Plan C 暴落判定結果**",
+        f"判定日: {today}",
+        "",
+        "**【市場状況】**",
+        f"VIX指数: {vix_value:.2f}",
+        f"日本市場: {'🚨 暴落' if jp_crash else '✅ 通常'}",
+        f"米国市場: {'🚨 暴落' if us_crash else '✅ 通常'}",
+        "",
+        "**【最終判定】**"
+    ]
     if not jp_crash and not us_crash:
-        message += f"✅ 両市場とも通常\n追加投資: なし\n15日の自動買付: {base_amount:,}円"
+        lines += ["✅ 両市場とも通常", "追加投資: なし", f"15日の自動買付: {yen.base}"]
     elif jp_crash and not us_crash:
-        message += f"🚨 日本市場のみ暴落\n追加投資: 日本資産に+{crash_fund_jp:,}円\n合計: {base_amount + crash_fund_jp:,}円"
+        lines += ["🚨 日本市場のみ暴落", f"追加投資: 日本資産に+{yen.crash_jp}", f"合計: {yen.total_with_crash_jp}"]
     elif not jp_crash and us_crash:
-        message += f"🚨 米国市場のみ暴落\n追加投資: 海外資産に+{crash_fund_os:,}円\n合計: {base_amount + crash_fund_os:,}円"
+        lines += ["🚨 米国市場のみ暴落", f"追加投資: 海外資産に+{yen.crash_os}", f"合計: {yen.total_with_crash_os}"]
     else:
-        message += f"🚨 両市場とも暴落\n追加投資: 全資産に+{base_amount:,}円\n合計: {base_amount * 2:,}円"
+        lines += ["🚨 両市場とも暴落", f"追加投資: 全資産に+{yen.base}", f"合計: {yen.total_with_crash_both}"]
+    message = "\n".join(lines)
 
     if st.button("📤 判定結果をDiscordに送信", type="primary"):
         # 同じメッセージの重複送信を防止
         if st.session_state.last_sent_message == message:
             st.warning("⚠️ 同じ内容を既に送信済みです。設定を変更してから再送信してください。")
         else:
-            # Discord通知を送信
-            with st.spinner("Discordに送信中..."):
-                if send_discord_notification(message):
-                    st.session_state.last_sent_message = message
-                    st.success("✅ Discordに送信しました！")
-                else:
-                    st.error("❌ Discord送信に失敗しました")
+            # Discord通知をバックグラウンドで送信（結果はフッター描画後に反映）
+            discord_status = st.empty()
+            discord_status.info("📤 Discordに送信中...")
+            discord_future = send_discord_notification(message)
 
 else:
     st.warning("⚠️ Discord通知が設定されていません")
@@ -1392,3 +1455,14 @@ else:
 # フッター
 st.markdown("---")
 st.caption("Plan C 投資戦略 - 月15日買付版（日米別判定） | 毎月14日に実施")
+
+# Discord送信結果の反映（画面の描画を終えてから待機）
+if discord_future is not None:
+    try:
+        if discord_future.result():
+            st.session_state.last_sent_message = message
+            discord_status.success("✅ Discordに送信しました！")
+        else:
+            discord_status.error("❌ Discord送信に失敗しました")
+    except Exception as e:
+        discord_status.error(f"❌ Discord通知エラー: {str(e)}")